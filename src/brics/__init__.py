@@ -31,10 +31,16 @@ def _get_args() -> Namespace:
 
     sub = p.add_subparsers(dest='subcommand')
 
-    sub.add_parser(
+    sub_run = sub.add_parser(
         'run',
         help="execute program")
 
+    sub_run.add_argument(
+        "-j", "--jit",
+        help=("compile program to native code with the system C compiler before executing "
+              "(falls back to the interpreter if unavailable)"),
+        action='store_true')
+
     sub_disassemble = sub.add_parser(
         'disassemble',
         help="output program into human readable form")
@@ -44,6 +50,11 @@ def _get_args() -> Namespace:
         help="output disassembly as a JSON object.",
         action='store_true')
 
+    sub_disassemble.add_argument(
+        "-p", "--pretty",
+        help="indent JSON output for readability (requires --json).",
+        action='store_true')
+
     sub.add_parser(
         'compile',
         help="compile program to C")
@@ -67,7 +78,12 @@ def _get_args() -> Namespace:
         action="store_true")
 
     # fmt: on
-    return p.parse_args()
+    args = p.parse_args()
+
+    if args.subcommand == "disassemble" and args.pretty and not args.json:
+        sub_disassemble.error("argument -p/--pretty: not allowed without argument -j/--json")
+
+    return args
 
 
 def _fatal_error(message: str, err: Optional[Exception] = None) -> NoReturn:
@@ -85,9 +101,9 @@ def main():
 
         match args.subcommand:
             case "run":
-                run_program(program)
+                run_program(program, jit=args.jit)
             case "disassemble":
-                disassemble(program, to_json=args.json)
+                disassemble(program, to_json=args.json, pretty=args.pretty)
             case "compile":
                 compile_to_c(program)
             case _:
@@ -6,85 +6,111 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 #
-# A section of this file is licensed under Creative Commons Attribution-ShareAlike 2.5 Generic.
-# See: https://creativecommons.org/licenses/by-sa/2.5/deed.en
-#
 
 __package__ = "brics"
 
-from brics.instructions import Instruction
+from brics.instructions import Op
 from brics.program import Program
 
+from typing import Optional, TextIO
+
 import sys
 
 # region private
 
 
-def _instr_to_c_statement(instr: Instruction) -> str:
+# C statement templates for each operation, formatted with the operation's operands.
+#
+# Offsets must be in the range [0, 30000); see `_op_to_c_statement`. Reading EOF ends the program,
+# the same as in the interpreter.
+#
+_C_STATEMENTS: dict[Op, str] = {
+    Op.MoveN: "ptr+={0};if(ptr>=30000)ptr-=30000;",
+    Op.AddN: "mem[ptr]+={0};",
+    Op.SetZero: "mem[ptr]=0;",
+    Op.MulAdd: "mem[(ptr+{0})%30000]+=mem[ptr]*{1};",
+    Op.Input: "{int c=getchar_unlocked();if(c==EOF)return 0;mem[ptr]=c;}",
+    Op.Output: "putchar_unlocked(mem[ptr]);",
+    Op.BeginLoop: "while(mem[ptr]){",
+    Op.EndLoop: "};",
+}
+
+_C_MOVE_BACKWARD = "ptr-={0};if(ptr<0)ptr+=30000;"
+
+
+def _op_to_c_statement(opcode: int, operand: int, factor: int) -> str:
     """
-    Returns a string containing a C statement for the given instruction, with the given
-    identifier context.
+    Returns a string containing a C statement for the given operation, as stored in a Program's
+    `opcodes`, `operands` and `factors`.
     """
-    match instr:
-        case Instruction.Next:
-            # Modular expression adapted from: https://stackoverflow.com/a/1082938
-            # (ShreevatsaR, CC BY-SA 2.5)
-            #
-            # NOTE: using `+1`/`-1` instead of pre-increment to avoid compiler warnings,
-            #       specifically, clang's `-Wunsequenced`.
-            #
-            return "ptr=((ptr+1)%30000+30000)%30000;"
-        case Instruction.Previous:
-            return "ptr=((ptr-1)%30000+30000)%30000;"
-        case Instruction.Add:
-            return "mem[ptr]++;"
-        case Instruction.Subtract:
-            return "mem[ptr]--;"
-        case Instruction.Input:
-            return "mem[ptr]=getchar();"
-        case Instruction.Output:
-            return "putchar(mem[ptr]);"
-        case Instruction.BeginLoop:
-            return "while(mem[ptr]){"
-        case Instruction.EndLoop:
-            return "};"
+    # Pointer moves wrap around with a comparison instead of a (double) modulo; this only needs
+    # the distance to be reduced below the memory size.
+    #
+    match opcode:
+        case Op.MoveN if operand < 0:
+            return _C_MOVE_BACKWARD.format(-operand % 30000)
+        case Op.MoveN:
+            return _C_STATEMENTS[Op.MoveN].format(operand % 30000)
+        case Op.MulAdd:
+            return _C_STATEMENTS[Op.MulAdd].format(operand % 30000, factor)
+        case Op.AddN:
+            return _C_STATEMENTS[Op.AddN].format(operand)
+
+    return _C_STATEMENTS[Op(opcode)]
 
 
 # endregion
 
 
-def compile_to_c(program: Program):
+def compile_to_c(program: Program, buf: Optional[TextIO] = None, *, header: bool = True):
     """
-    Converts the given Program to C code using the given relex, and prints to standard output.
+    Converts the given Program to C code using the given relex, and prints to `buf` (standard output
+    if unspecified).
 
-    Uses `source_filename`, `optimised` and `Relex` for header and context comments.
+    Uses `source_filename`, `optimised` and `Relex` for header and context comments, unless `header`
+    is False.
     """
-    buf = sys.stdout
+    buf = sys.stdout if buf is None else buf
+    parts = list[str]()
 
     # Writing: comment header - program source and optimisation context
     #
-    buf.write((
-        "/* \n"
-        " * Code auto-generated with brics.\n"
-       f" *   Source file: {program.source_file}\n"
-       f" *   Optimised:   {program.optimised}\n"
-       f" *   Relex:       {program.relex.name}\n"
-        " */\n"))  # fmt: skip
+    if header:
+        parts.append((
+            "/* \n"
+            " * Code auto-generated with brics.\n"
+           f" *   Source file: {program.source_file}\n"
+           f" *   Optimised:   {program.optimised}\n"
+           f" *   Relex:       {program.relex.name}\n"
+            " */\n"))  # fmt: skip
 
     # Writing: code preamble
+    #   * getchar_unlocked/putchar_unlocked skip stdio's per-call locking; they are POSIX, so
+    #     fall back to the locking versions on Windows
     #
-    buf.write((
+    parts.append((
+        "#ifndef _POSIX_C_SOURCE\n"
+        "#define _POSIX_C_SOURCE 200809L\n"
+        "#endif\n"
         "#include <stdio.h>\n"
+        "#ifdef _WIN32\n"
+        "#define getchar_unlocked getchar\n"
+        "#define putchar_unlocked putchar\n"
+        "#endif\n"
         "int main(void){"
-            "char mem[30000];"
+            "unsigned char mem[30000]={0};"
             "int ptr=0;"))  # fmt: skip
 
-    for instr in program.instructions:
-        # Writing: current instruction
-        #
-        buf.write(_instr_to_c_statement(instr))
+    # Writing: operations
+    #
+    parts.extend(map(_op_to_c_statement, program.opcodes, program.operands, program.factors))
 
     # Writing: code epilogue
     #   * end main function
     #
-    buf.write("}\n")
+    parts.append("}\n")
+
+    # The output is built up in memory and written in one go, rather than with a write per
+    # operation.
+    #
+    buf.write("".join(parts))
@@ -10,9 +10,9 @@
 __package__ = "brics"
 
 from brics.program import Program
-from brics.instructions import Instruction
+from brics.instructions import Instruction, Op
 
-from math import log10
+from array import array
 from typing import Iterable, Iterator
 
 import sys
@@ -22,40 +22,59 @@ import json
 
 
 def _get_max_width(source: Iterable[int]) -> int:
-    return int(log10(max(source))) + 1
+    return len(str(max(source)))
+
+
+_OPERAND_COUNTS: dict[Op, int] = {Op.MoveN: 1, Op.AddN: 1, Op.MulAdd: 2}
+
+
+def _get_operations(program: Program) -> Iterator[tuple[Op, tuple[int, ...]]]:
+    """
+    Generates the program's lowered operations (see `Op`), each with its operands.
+    """
+    for opcode, operand, factor in zip(program.opcodes, program.operands, program.factors):
+        op = Op(opcode)
+        yield op, (operand, factor)[: _OPERAND_COUNTS.get(op, 0)]
 
 
 # endregion
 
 
-def _flatten_loop_boundaries(loop_boundaries: dict[int, int]) -> Iterator[tuple[int, int]]:
-    seen = set[int]()
-    for li, ri in loop_boundaries.items():
-        if li in seen:
-            continue
-        yield (ri, li) if ri < li else (li, ri)
-        seen.add(ri)
+def _flatten_loop_boundaries(loop_boundaries: array[int]) -> Iterator[tuple[int, int]]:
+    # Every pair is stored in both directions, and non-loop entries are -1; keep left -> right.
+    return ((li, ri) for li, ri in enumerate(loop_boundaries) if li < ri)
 
 
-def _disassemble_json(program: Program):
+def _disassemble_json(program: Program, *, pretty: bool):
     """
     Print a JSON disassembled form of the Brainfuck source code.
+
+    Output is compact unless `pretty` is True, in which case it is indented for reading.
     """
     obj = {
-        "filename": str(program.source_file),
+        "filename": program.source_file,
         "optimised": program.optimised,
         "relex": program.relex.name,
         "instruction": [
             {"index": idx, "instruction": instr.name}
-            for (idx, instr) in enumerate(program.instructions)
-            if instr is not None
+            for (idx, instr) in enumerate(map(Instruction, program.instructions))
         ],
         "loop_indices": [
             {"left": li, "right": ri}
-            for li, ri in sorted(_flatten_loop_boundaries(program.loop_boundaries))
+            for li, ri in _flatten_loop_boundaries(program.loop_boundaries)
+        ],
+        "operation": [
+            {"index": idx, "operation": op.name, "operands": operands}
+            for (idx, (op, operands)) in enumerate(_get_operations(program))
         ],
     }
-    json.dump(obj, sys.stdout, indent=2)
+    # `json.dumps` encodes the whole document in one go, which is much faster than `json.dump`'s
+    # chunk-by-chunk encoding into the stream.
+    #
+    if pretty:
+        sys.stdout.write(json.dumps(obj, indent=2))
+    else:
+        sys.stdout.write(json.dumps(obj, separators=(",", ":")))
 
 
 def _disassemble_readable(program: Program):
@@ -82,11 +101,20 @@ def _disassemble_readable(program: Program):
             9    EndLoop
             10  EndLoop
             11  Output
-            12  ◻
 
         Loop Indices:
             4  10
             7  9
+
+        Operations:
+            0  AddN              4
+            1  BeginLoop
+            2    AddN              -2
+            3    BeginLoop
+            4      AddN              -1
+            5    EndLoop
+            6  EndLoop
+            7  Output
         ---
     """
     buf = sys.stdout
@@ -100,28 +128,62 @@ def _disassemble_readable(program: Program):
 
     max_idx = _get_max_width((len(program.instructions),))
     indent_level = 0
+    indent = ""
+    rows = list[str]()
+
+    # Rows are built up in memory and written in one go; the indent string is only rebuilt when
+    # the loop nesting level changes.
+    #
+    for idx, instr in enumerate(map(Instruction, program.instructions)):
+        if instr == Instruction.EndLoop:
+            indent_level -= 1
+            indent = "  " * indent_level
 
-    for idx, instr in enumerate(program.instructions):
-        indent_level -= 1 if instr == Instruction.EndLoop else 0
+        rows.append(f"    {idx:>{max_idx}}  {indent}{instr.name:<18}\n")
 
-        instr_name = "◻" if instr is None else instr.name
-        buf.write(f"    {idx:>{max_idx}}  {'  ' * indent_level}{instr_name:<18}\n")
+        if instr == Instruction.BeginLoop:
+            indent_level += 1
+            indent = "  " * indent_level
 
-        indent_level += 1 if instr == Instruction.BeginLoop else 0
+    buf.write("".join(rows))
 
     buf.write(("\nLoop Indices:\n"))
 
-    if len(program.loop_boundaries) == 0:
+    flattened_loop_boundaries = tuple(_flatten_loop_boundaries(program.loop_boundaries))
+    if len(flattened_loop_boundaries) == 0:
         buf.write("    (none)\n")
     else:
-        flattened_loop_boundaries = tuple(_flatten_loop_boundaries(program.loop_boundaries))
         max_li, max_ri = tuple(_get_max_width(i) for i in zip(*flattened_loop_boundaries))
-        for li, ri in sorted(flattened_loop_boundaries):
-            buf.write(f"    {li:>{max_li}} ⋄ {ri:<{max_ri}}\n")
+        buf.write("".join(
+            f"    {li:>{max_li}} ⋄ {ri:<{max_ri}}\n"
+            for li, ri in flattened_loop_boundaries))  # fmt: skip
+
+    # Operations are what actually gets executed and compiled, after fusion and (with `-o`) idiom
+    # replacement.
+    #
+    buf.write("\nOperations:\n")
+
+    max_idx = _get_max_width((len(program.opcodes),))
+    indent_level = 0
+    indent = ""
+    rows = list[str]()
+
+    for idx, (op, operands) in enumerate(_get_operations(program)):
+        if op == Op.EndLoop:
+            indent_level -= 1
+            indent = "  " * indent_level
+
+        rows.append(f"    {idx:>{max_idx}}  {indent}{op.name:<18}{" ".join(map(str, operands))}\n")
+
+        if op == Op.BeginLoop:
+            indent_level += 1
+            indent = "  " * indent_level
+
+    buf.write("".join(rows))
 
 
-def disassemble(program: Program, *, to_json: bool):
+def disassemble(program: Program, *, to_json: bool, pretty: bool = False):
     if to_json:
-        _disassemble_json(program)
+        _disassemble_json(program, pretty=pretty)
     else:
         _disassemble_readable(program)
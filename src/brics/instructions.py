@@ -16,8 +16,11 @@ import enum
 
 
 @final
-class Instruction(enum.Enum):
-    """Brainfuck instructions."""
+class Instruction(enum.IntEnum):
+    """
+    Brainfuck instructions. Values fit in a byte, and are used directly as opcodes in a program's
+    instruction stream.
+    """
 
     Next = enum.auto()
     Previous = enum.auto()
@@ -34,49 +37,64 @@ class Instruction(enum.Enum):
         Returns the corresponding Brainfuck instruction that `char` represents.
         Return None if `len(char) > 1`, or `char` is not a valid Brainfuck instruction.
         """
-        match char:
-            case ">":
-                return cls.Next
-            case "<":
-                return cls.Previous
-            case "+":
-                return cls.Add
-            case "-":
-                return cls.Subtract
-            case "[":
-                return cls.BeginLoop
-            case "]":
-                return cls.EndLoop
-            case ",":
-                return cls.Input
-            case ".":
-                return cls.Output
-            case _:
-                return None
+        return _CHAR_TO_INSTRUCTION.get(char)
 
     def to_char(self) -> str:
         """
         Returns the corresponding standard character of the Brainfuck instruction.
         """
-        match self:
-            case Instruction.Next:
-                return ">"
-            case Instruction.Previous:
-                return "<"
-            case Instruction.Add:
-                return "+"
-            case Instruction.Subtract:
-                return "-"
-            case Instruction.BeginLoop:
-                return "["
-            case Instruction.EndLoop:
-                return "]"
-            case Instruction.Input:
-                return ","
-            case Instruction.Output:
-                return "."
+        return _INSTRUCTION_TO_CHAR[self]
 
     @classmethod
     def all_instructions(cls) -> set[Instruction]:
         """Return a set of all instructions."""
         return {i for i in cls}
+
+
+# region private
+
+# fmt: off
+_CHAR_TO_INSTRUCTION: dict[str, Instruction] = {
+    ">": Instruction.Next,
+    "<": Instruction.Previous,
+    "+": Instruction.Add,
+    "-": Instruction.Subtract,
+    "[": Instruction.BeginLoop,
+    "]": Instruction.EndLoop,
+    ",": Instruction.Input,
+    ".": Instruction.Output}
+# fmt: on
+
+_INSTRUCTION_TO_CHAR: dict[Instruction, str] = {
+    instr: char for char, instr in _CHAR_TO_INSTRUCTION.items()
+}
+
+# endregion
+
+
+@final
+class Op(enum.IntEnum):
+    """
+    Lowered operations, produced from Brainfuck instructions for execution and compilation.
+    Values fit in a byte, and are used directly as interpreter opcodes.
+
+    Each operation is paired with its operands in an `Operation` tuple:
+        (MoveN, count)            -- fused run of Next/Previous, `count` is signed
+        (AddN, count)             -- fused run of Add/Subtract, `count` is signed
+        (SetZero,)                -- clear loop, e.g. `[-]`
+        (MulAdd, offset, factor)  -- add the current cell times `factor` to the cell at `offset`,
+                                     e.g. `[->+++<]` (always followed by SetZero)
+        (BeginLoop,), (EndLoop,), (Input,), (Output,)
+    """
+
+    MoveN = enum.auto()
+    AddN = enum.auto()
+    BeginLoop = enum.auto()
+    EndLoop = enum.auto()
+    Input = enum.auto()
+    Output = enum.auto()
+    SetZero = enum.auto()
+    MulAdd = enum.auto()
+
+
+type Operation = tuple[Op, *tuple[int, ...]]
@@ -0,0 +1,154 @@
+# brics - native (JIT) execution functionality.
+#
+# Author: Jahin Z. <jahinzee>
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+
+__package__ = "brics"
+
+from brics.compiler import compile_to_c
+from brics.program import Program
+
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Optional
+
+import ctypes
+import hashlib
+import os
+import shutil
+import signal
+import subprocess
+import sys
+
+# region private
+
+_CC_FLAGS = ("-O2", "-shared", "-fPIC", "-w", "-x", "c")
+
+# Once the cache holds more libraries than this, the least recently used ones are deleted.
+#
+_CACHE_MAX_ENTRIES = 64
+
+
+def _find_c_compiler() -> Optional[str]:
+    """
+    Returns the path to a usable C compiler, preferring the one set in the `CC` environment
+    variable. Returns None if no compiler can be found.
+    """
+    for name in (os.environ.get("CC"), "cc", "gcc", "clang"):
+        if name is not None and (path := shutil.which(name)) is not None:
+            return path
+    return None
+
+
+def _build_library(cc: str, source: str, workdir: Path) -> Optional[Path]:
+    """
+    Compiles C source code into a shared library inside `workdir`.
+
+    Returns None if compilation fails.
+    """
+    library = workdir / "program.so"
+    # fmt: off
+    result = subprocess.run(
+        (cc, *_CC_FLAGS, "-", "-o", str(library)),
+        input=source.encode(),
+        capture_output=True)
+    # fmt: on
+    return library if result.returncode == 0 else None
+
+
+def _cache_path(cc: str, source: str) -> Path:
+    """
+    Returns where a shared library compiled from C source code with the given compiler is cached.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    key = hashlib.sha256("\0".join((cc, *_CC_FLAGS, source)).encode()).hexdigest()
+    return Path(cache_home) / "brics" / f"{key}.so"
+
+
+def _store_in_cache(library: Path, cached: Path):
+    """
+    Copies a compiled shared library into the cache, then evicts the least recently used libraries
+    beyond `_CACHE_MAX_ENTRIES`. The cache is best-effort, so failures are ignored.
+    """
+    try:
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        partial = cached.with_suffix(f".{os.getpid()}.tmp")
+        shutil.copyfile(library, partial)
+        os.replace(partial, cached)
+
+        # fmt: off
+        libraries = sorted(
+            cached.parent.glob("*.so"), key=lambda path: path.stat().st_mtime, reverse=True)
+        # fmt: on
+        for stale in libraries[_CACHE_MAX_ENTRIES:]:
+            stale.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+# endregion
+
+
+def run_native(program: Program) -> bool:
+    """
+    Compiles the given Program to a native shared library using the system C compiler, and
+    executes it in-process. Compiled libraries are cached (under `$XDG_CACHE_HOME/brics`, keyed by
+    the generated code), so running the same program again skips the compiler.
+
+    Returns False (without executing anything) on Windows, if no C compiler is available, or if
+    compilation fails -- callers should fall back to the interpreter in that case.
+    """
+    # Flushing the C runtime's stdio goes through `ctypes.CDLL(None)`, which isn't supported on
+    # Windows.
+    #
+    if os.name == "nt":
+        return False
+
+    cc = _find_c_compiler()
+    if cc is None:
+        return False
+
+    source = StringIO()
+    # The comment header names the source file and relex; leave it out so that the same program
+    # hits the cache wherever it is run from.
+    #
+    compile_to_c(program, source, header=False)
+
+    cached = _cache_path(cc, source.getvalue())
+
+    with TemporaryDirectory(prefix="brics-") as workdir:
+        if cached.is_file():
+            library = cached
+            try:
+                os.utime(cached)  # Mark as recently used, for eviction.
+            except OSError:
+                pass
+        else:
+            library = _build_library(cc, source.getvalue(), Path(workdir))
+            if library is None:
+                return False
+            _store_in_cache(library, cached)
+        entry = ctypes.CDLL(str(library)).main
+        entry.argtypes = ()
+        entry.restype = None
+
+        # The native code shares the C runtime's stdio buffers, not Python's, so flush ours first
+        # and theirs afterwards to keep output ordered.
+        #
+        # Python's SIGINT handler only raises once control returns to the interpreter, which
+        # never happens inside a non-terminating program, so restore the default handler.
+        #
+        sys.stdout.flush()
+        previous_handler = signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            entry()
+        finally:
+            signal.signal(signal.SIGINT, previous_handler)
+            ctypes.CDLL(None).fflush(None)
+
+    return True
@@ -10,9 +10,11 @@
 __package__ = "brics"
 
 from brics.exceptions import BfRuntimeGracefulExit
-from brics.instructions import Instruction
+from brics.instructions import Op
 from brics.program import Program
 
+from typing import BinaryIO, final
+
 import sys
 
 # region private
@@ -20,63 +22,161 @@ import sys
 _MEMORY_SIZE = 30_000
 
 
-def _input() -> int:
+@final
+class _Output:
     """
-    Return a single character from standard input as an integer.
+    Buffered writer of bytes to standard output.
 
-    Raises `BrainfuckException` (runtime, graceful) if an EOF or NUL is read.
+    The buffer is flushed when it fills up, and on line feeds if standard output is interactive.
     """
-    byte = sys.stdin.read(1)
-    if len(byte) != 1:
-        raise BfRuntimeGracefulExit()
-    return ord(byte)
 
+    __slots__ = "_buffer", "_stream", "_line_buffered"
+
+    _buffer: bytearray
+    _stream: BinaryIO
+    _line_buffered: bool
+
+    _BUFFER_SIZE = 64 * 1024
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._stream = sys.stdout.buffer
+        self._line_buffered = sys.stdout.isatty()
+
+    def write(self, val: int):
+        """
+        Buffers a single integer to be written to standard output as a byte.
+        """
+        self._buffer.append(val)
+        LINE_FEED = 0x0A
+        if len(self._buffer) >= self._BUFFER_SIZE or (val == LINE_FEED and self._line_buffered):
+            self.flush()
 
-def _output(val: int):
+    def flush(self):
+        """
+        Writes out any buffered bytes.
+        """
+        if len(self._buffer) != 0:
+            self._stream.write(self._buffer)
+            self._stream.flush()
+            self._buffer.clear()
+
+
+@final
+class _Input:
     """
-    Writes a single integer to standard output as an ASCII/Unicode character.
+    Buffered reader of bytes from standard input.
+
+    Reads whatever is available (up to a chunk) at a time, flushing `output` before each read so
+    that prompts are visible before blocking.
     """
-    sys.stdout.write(chr(val))
-    LINE_FEED = 0x0A
-    if val == LINE_FEED:
-        sys.stdout.flush()
+
+    __slots__ = "_buffer", "_pos", "_stream", "_output"
+
+    _buffer: bytes
+    _pos: int
+    _stream: BinaryIO
+    _output: _Output
+
+    _CHUNK_SIZE = 4 * 1024
+
+    def __init__(self, output: _Output) -> None:
+        self._buffer = b""
+        self._pos = 0
+        self._stream = sys.stdin.buffer
+        self._output = output
+
+    def read(self) -> int:
+        """
+        Return a single byte from standard input as an integer.
+
+        Raises `BrainfuckException` (runtime, graceful) if an EOF is read.
+        """
+        if self._pos == len(self._buffer):
+            self._output.flush()
+            self._buffer = self._stream.read1(self._CHUNK_SIZE)
+            self._pos = 0
+            if len(self._buffer) == 0:
+                raise BfRuntimeGracefulExit()
+        val = self._buffer[self._pos]
+        self._pos += 1
+        return val
 
 
 # endregion
 
 
-def run_program(program: Program):
+def run_program(program: Program, *, jit: bool = False):
     """
     Begins process execution.
 
+    If `jit` is True, compiles the program to native code with the system C compiler and runs
+    that instead, falling back to the interpreter if no compiler is available (or on Windows).
+
     Raises `BrainfuckException` (runtime) if a runtime error occurs.
     """
-    program = program
+    if jit:
+        # Imported here so that plain interpretation never loads ctypes and the compiler pipeline.
+        #
+        from brics.jit import run_native
+
+        if run_native(program):
+            return
+
     program_ptr = 0
-    data = [0 for _ in range(_MEMORY_SIZE)]
+    data = bytearray(_MEMORY_SIZE)
     data_ptr = 0
-
-    idx_end_of_program = len(program.instructions)
-
-    while program_ptr != idx_end_of_program:
-        match program.instructions[program_ptr]:
-            case Instruction.Next:
-                data_ptr += 1
-            case Instruction.Previous:
-                data_ptr -= 1
-            case Instruction.Add:
-                data[data_ptr] += 1
-            case Instruction.Subtract:
-                data[data_ptr] -= 1
-            case Instruction.BeginLoop if data[data_ptr] == 0:
-                program_ptr = program.loop_boundaries[program_ptr]
-            case Instruction.EndLoop if data[data_ptr] != 0:
-                program_ptr = program.loop_boundaries[program_ptr]
-            case Instruction.Input:
-                data[data_ptr] = _input()
-            case Instruction.Output:
-                _output(data[data_ptr])
-
-        data_ptr %= _MEMORY_SIZE
-        data[data_ptr] %= 256
-        program_ptr += 1
+    output = _Output()
+    input_ = _Input(output)
+
+    # Everything used in the loop below is bound to a local beforehand, so that it never has to
+    # look up attributes or globals. Opcodes in particular are bound to plain ints, so comparing
+    # against them doesn't go through `Op` attribute lookups and enum comparisons.
+    #
+    opcodes = program.opcodes
+    operands = program.operands
+    factors = program.factors
+    jumps = program.jumps
+    write_output = output.write
+    read_input = input_.read
+    memory_size = _MEMORY_SIZE
+
+    idx_end_of_program = len(opcodes)
+
+    ADD_N = Op.AddN.value
+    MOVE_N = Op.MoveN.value
+    END_LOOP = Op.EndLoop.value
+    BEGIN_LOOP = Op.BeginLoop.value
+    MUL_ADD = Op.MulAdd.value
+    SET_ZERO = Op.SetZero.value
+    OUTPUT = Op.Output.value
+    INPUT = Op.Input.value
+
+    # Dispatch is an if/elif chain ordered by how often each operation tends to be executed.
+    #
+    try:
+        while program_ptr != idx_end_of_program:
+            op = opcodes[program_ptr]
+            if op == ADD_N:
+                data[data_ptr] = (data[data_ptr] + operands[program_ptr]) & 0xFF
+            elif op == MOVE_N:
+                data_ptr = (data_ptr + operands[program_ptr]) % memory_size
+            elif op == END_LOOP:
+                if data[data_ptr] != 0:
+                    program_ptr = jumps[program_ptr]
+            elif op == BEGIN_LOOP:
+                if data[data_ptr] == 0:
+                    program_ptr = jumps[program_ptr]
+            elif op == MUL_ADD:
+                target_ptr = (data_ptr + operands[program_ptr]) % memory_size
+                data[target_ptr] = (data[target_ptr] + data[data_ptr] * factors[program_ptr]) & 0xFF
+            elif op == SET_ZERO:
+                data[data_ptr] = 0
+            elif op == OUTPUT:
+                write_output(data[data_ptr])
+            elif op == INPUT:
+                data[data_ptr] = read_input()
+
+            program_ptr += 1
+    finally:
+        output.flush()
@@ -10,112 +10,233 @@
 __package__ = "brics"
 
 from brics.exceptions import ParsingError
-from brics.instructions import Instruction
+from brics.instructions import Instruction, Op, Operation
 from brics.relex import Relex
 
+from array import array
 from typing import final, Optional
-from pathlib import Path
 from io import TextIOWrapper
 
+import re
 
 @final
 class Program:
-    """A valid parsed Brainfuck program with pre-computed loop boundary indices."""
+    """
+    A valid parsed Brainfuck program with pre-computed loop boundary indices.
 
-    __slots__ = "instructions", "loop_boundaries", "relex", "optimised", "source_file"
+    `instructions` (as opcodes, see `Instruction`) and `loop_boundaries` (the matching bracket
+    index for each instruction, or -1) describe the program as written. Its lowered form (see `Op`),
+    which is what gets executed and compiled, is stored as parallel arrays: `opcodes`, `operands`
+    (counts or offsets), `factors` and `jumps` (the matching loop index, or -1).
+    """
 
-    source_file: Path
-    instructions: tuple[Instruction, ...]
-    loop_boundaries: dict[int, int]
+    # fmt: off
+    __slots__ = (
+        "instructions", "_loop_boundaries", "opcodes", "operands", "factors", "jumps",
+        "relex", "optimised", "source_file")
+    # fmt: on
+
+    source_file: str
+    instructions: bytes
+    _loop_boundaries: Optional[array[int]]
+    opcodes: bytes
+    operands: array[int]
+    factors: array[int]
+    jumps: array[int]
     relex: Relex
     optimised: bool
 
     # region private
 
-    def _trim_headers(self):
-        while self._trim_header_once():
-            pass
-
-    def _trim_header_once(self) -> bool:
-        result = self._get_first_bounds(self.instructions)
-        if result is None:
-            return False
-        li, ri = result
-        if li != 0:
-            return False
-        self.instructions = self.instructions[ri + 1 :]
-        return True
+    # Matches any loop instruction, so bracket matching can skip over everything else in one go.
+    #
+    _LOOP_INSTRUCTIONS = re.compile(
+        b"[" + re.escape(bytes((Instruction.BeginLoop, Instruction.EndLoop))) + b"]")
 
     @staticmethod
-    def _make_bounds(instrs: tuple[Optional[Instruction], ...]) -> dict[int, int]:
+    def _find_header_length(instrs: bytes) -> int:
         """
-        Returns a *set* of matching LoopStart and LoopEnd indices from a given sequence of
-        instructions
+        Returns the length of the comment header of a given sequence of instructions -- the run of
+        loops at the very start of the program, which can never execute:
 
-        Raises `ParsingError` if there are unbalanced loops.
+            [···[··]···][····]+++[··]···
+            ↑________________↑
+
+        Scanning stops at the first instruction past the header. Unbalanced loops are not reported
+        here; the header just ends before them.
         """
-        output = {}
-        stack = []
+        BEGIN_LOOP, END_LOOP = Instruction.BeginLoop.value, Instruction.EndLoop.value
+        header_length = 0
+        depth = 0
 
         for idx, instr in enumerate(instrs):
-            if instr is None:
+            if instr == BEGIN_LOOP:
+                depth += 1
+            elif instr == END_LOOP:
+                depth -= 1
+                if depth == 0:
+                    header_length = idx + 1
+                elif depth < 0:
+                    break
+            elif depth == 0:
                 break
-            if idx is None:
-                continue
-            match instr:
-                case Instruction.BeginLoop:
-                    stack.append(idx)
-                case Instruction.EndLoop:
-                    try:
-                        right_idx = stack.pop()
-                    except IndexError:
-                        raise ParsingError(idx, "Unmatched ] instruction")
-                    output[idx] = right_idx
-                    output[right_idx] = idx
 
-        if len(stack) != 0:
-            idx = stack.pop()
-            raise ParsingError(idx, "Unmatched [ instruction")
+        return header_length
+
+    @staticmethod
+    def _make_bounds(instrs: bytes) -> array[int]:
+        """
+        Returns a jump table for a given sequence of instructions: the matching LoopEnd index for
+        each LoopStart and vice versa, with -1 for all other instructions.
+
+        Raises `ParsingError` if there are unbalanced loops.
+
+        Execution and compilation use the jumps computed while lowering instead, so this only runs
+        for disassembly and to report unbalanced loops.
+        """
+        output = array("i", [-1]) * len(instrs)
+
+        # The stack can never be deeper than the number of LoopStarts, so it is allocated upfront
+        # and `depth` tracks its top, rather than growing and shrinking a list.
+        #
+        BEGIN_LOOP = Instruction.BeginLoop.value
+        stack = [0] * instrs.count(BEGIN_LOOP)
+        depth = 0
+
+        # Only loop instructions are visited, so anything that isn't a LoopStart is a LoopEnd.
+        #
+        for match in Program._LOOP_INSTRUCTIONS.finditer(instrs):
+            idx = match.start()
+            if instrs[idx] == BEGIN_LOOP:
+                stack[depth] = idx
+                depth += 1
+            else:
+                if depth == 0:
+                    raise ParsingError(idx, "Unmatched ] instruction")
+                depth -= 1
+                left_idx = stack[depth]
+                output[idx] = left_idx
+                output[left_idx] = idx
+
+        if depth != 0:
+            raise ParsingError(stack[depth - 1], "Unmatched [ instruction")
         return output
 
     @staticmethod
-    def _get_first_bounds(
-        instrs: tuple[Optional[Instruction], ...],
-    ) -> Optional[tuple[int, int]]:
+    def _match_idiom(body: list[Operation]) -> Optional[list[Operation]]:
+        """
+        Returns constant-time replacement operations for the body of a loop, if it is a clear loop
+        (`[-]`) or a multiply loop (`[->+++>+<<]`).
+
+        A loop qualifies if its body only contains MoveN and AddN operations, returns to the cell it
+        started at, and changes that cell by exactly 1 per iteration. Returns `None` otherwise.
         """
-        Returns the *first* matching LoopStart and LoopEnd indices from a given sequence of
-        instructions.x
+        offset = 0
+        deltas = dict[int, int]()
 
-        The first pair based on the position of LoopStart:
+        for op in body:
+            match op:
+                case (Op.MoveN, count):
+                    offset += count
+                case (Op.AddN, count):
+                    deltas[offset] = deltas.get(offset, 0) + count
+                case _:
+                    return None
 
-            ···[··[···]····]
-               ↑___________↑
+        origin_delta = deltas.pop(0, 0)
+        if offset != 0 or origin_delta not in (-1, 1):
+            return None
 
-        Returns `None` if there are no loop bounds.
+        # The loop runs `v` times for a decrementing origin cell (with value `v`), and `256 - v`
+        # times for an incrementing one; the latter is the same as running `v` times with every
+        # other delta negated.
+        #
+        # fmt: off
+        return [
+            *((Op.MulAdd, cell, -delta * origin_delta)
+              for cell, delta in deltas.items() if delta != 0),
+            (Op.SetZero,)]
+        # fmt: on
+
+    @staticmethod
+    def _lower(instrs: bytes, *, optimise: bool) -> tuple[Operation, ...]:
+        """
+        Lowers a sequence of instructions into operations, fusing runs of Add/Subtract and
+        Next/Previous into single counted operations (runs that cancel out are dropped).
+
+        If `optimise` is True, also replaces clear and multiply loops with constant-time
+        operations (see `_match_idiom`).
 
         Raises `ParsingError` if there are unbalanced loops.
         """
-        output = set()
+        ops = list[Operation]()
         stack = []
 
-        for idx, instr in enumerate(instrs):
-            if idx == 0 and instr != Instruction.BeginLoop:
-                return None
-            match instr:
-                case Instruction.BeginLoop:
-                    stack.append(idx)
-                case Instruction.EndLoop:
-                    try:
-                        output.add((stack.pop(), idx))
-                    except IndexError:
-                        raise ParsingError(idx, "Unmatched ] instruction")
-                    if len(stack) == 0:
-                        return (0, idx)
+        # Instructions are compared as plain ints (see `Instruction`), ordered by how often they
+        # tend to appear in source.
+        #
+        ADD, SUBTRACT = Instruction.Add.value, Instruction.Subtract.value
+        NEXT, PREVIOUS = Instruction.Next.value, Instruction.Previous.value
+        BEGIN_LOOP, END_LOOP = Instruction.BeginLoop.value, Instruction.EndLoop.value
+        INPUT = Instruction.Input.value
+
+        for instr in instrs:
+            if instr == ADD or instr == SUBTRACT:
+                op, step = Op.AddN, 1 if instr == ADD else -1
+            elif instr == NEXT or instr == PREVIOUS:
+                op, step = Op.MoveN, 1 if instr == NEXT else -1
+            elif instr == BEGIN_LOOP:
+                stack.append(len(ops))
+                ops.append((Op.BeginLoop,))
+                continue
+            elif instr == END_LOOP:
+                if len(stack) == 0:
+                    Program._make_bounds(instrs)  # Raises, pointing at the unmatched instruction.
+                left_idx = stack.pop()
+                if optimise and (idiom := Program._match_idiom(ops[left_idx + 1 :])):
+                    del ops[left_idx:]
+                    ops.extend(idiom)
+                    continue
+                ops.append((Op.EndLoop,))
+                continue
+            else:
+                ops.append((Op.Input,) if instr == INPUT else (Op.Output,))
+                continue
+
+            if len(ops) != 0 and ops[-1][0] == op:
+                _, count = ops.pop()
+                step += count
+            if step != 0:
+                ops.append((op, step))
 
         if len(stack) != 0:
-            idx = stack.pop()
-            raise ParsingError(idx, "Unmatched [ instruction")
-        return None
+            Program._make_bounds(instrs)  # Raises, pointing at the unmatched instruction.
+        return tuple(ops)
+
+    @staticmethod
+    def _flatten(
+        ops: tuple[Operation, ...],
+    ) -> tuple[bytes, array[int], array[int], array[int]]:
+        """
+        Flattens operations into parallel arrays of opcodes, first operands (counts or offsets),
+        second operands (factors), and jump targets -- the matching EndLoop index for each
+        BeginLoop and vice versa, with -1 for all other operations. Missing operands are 0.
+        """
+        opcodes = bytes(op[0] for op in ops)
+        operands = array("i", (op[1] if len(op) > 1 else 0 for op in ops))
+        factors = array("i", (op[2] if len(op) > 2 else 0 for op in ops))
+
+        jumps = array("i", [-1]) * len(ops)
+        stack = []
+        for idx, op in enumerate(opcodes):
+            if op == Op.BeginLoop:
+                stack.append(idx)
+            elif op == Op.EndLoop:
+                left_idx = stack.pop()
+                jumps[left_idx] = idx
+                jumps[idx] = left_idx
+
+        return opcodes, operands, factors, jumps
 
     # endregion
 
@@ -124,15 +245,33 @@ class Program:
         Create a valid Brainfuck program from source text, and a Relex object for character to
         instruction conversion.
 
-        If `optimise` is True, applies basic optimisations (trimming comment headers).
+        If `optimise` is True, applies basic optimisations (trimming comment headers, replacing
+        clear and multiply loops).
 
         Raises `ParsingError` if there are errors in the source.
         """
 
-        self.instructions = tuple(relex.text_to_instrs(text))
+        instructions = relex.text_to_opcodes(text)
         if optimise:
-            self._trim_headers()
+            instructions = instructions[self._find_header_length(instructions) :]
+
+        self.instructions = instructions
         self.optimised = optimise
-        self.loop_boundaries = self._make_bounds(self.instructions)
+        self._loop_boundaries = None
+        # Only the flattened form is kept; the operation tuples are much larger.
+        #
+        ops = self._lower(self.instructions, optimise=optimise)
+        self.opcodes, self.operands, self.factors, self.jumps = self._flatten(ops)
         self.relex = relex
-        self.source_file = Path(text.name)
+        self.source_file = text.name
+
+    @property
+    def loop_boundaries(self) -> array[int]:
+        """
+        The matching bracket index for each instruction, or -1 (see `_make_bounds`).
+
+        Only the disassembler needs these, so they are computed on first access.
+        """
+        if self._loop_boundaries is None:
+            self._loop_boundaries = self._make_bounds(self.instructions)
+        return self._loop_boundaries
@@ -12,21 +12,11 @@ __package__ = "brics"
 from brics.exceptions import RelexParsingError
 from brics.instructions import Instruction
 
-from typing import final, Iterable, Self
+from typing import Callable, final, Optional, Self
 from io import TextIOWrapper
-from pathlib import Path
 
-# region private
-
-
-def _buf_peek(buf: TextIOWrapper, count: int) -> str:
-    current_pos = buf.tell()
-    output = buf.read(count)
-    buf.seek(current_pos)
-    return output
-
-
-# endregion
+import os
+import re
 
 
 @final
@@ -37,10 +27,11 @@ class Relex:
     CONSTRUCTOR: Raises `RelexParsingError` if definitions are not exhaustive.
     """
 
-    __slots__ = "name", "instruction_map"
+    __slots__ = "name", "instruction_map", "_tokenise"
 
     name: str
     instruction_map: dict[Instruction, str]
+    _tokenise: Callable[[str], bytes]
 
     def __init__(self, *, name: str, instruction_map: dict[Instruction, str]) -> None:
         missing = set(Instruction.all_instructions()) - set(instruction_map.keys())
@@ -53,6 +44,77 @@ class Relex:
         self.name = name
         self.instruction_map = instruction_map
 
+        # Only the fastest tokeniser that can handle this relex is built.
+        #
+        self._tokenise = (
+            self._make_translator(instruction_map)
+            or self._make_char_translator(instruction_map)
+            or self._make_scanner(instruction_map))  # fmt: skip
+
+    @staticmethod
+    def _make_translator(
+        instruction_map: dict[Instruction, str],
+    ) -> Optional[Callable[[str], bytes]]:
+        """
+        Returns a tokeniser that maps each instruction's character to its opcode with
+        `bytes.translate`, deleting everything else.
+
+        Returns `None` if any instruction is not a single Latin-1 character.
+        """
+        if any(len(text) != 1 or ord(text) > 0xFF for text in instruction_map.values()):
+            return None
+        # Filled in reverse, so that if instructions share a character, the first one wins (as it
+        # does when scanning).
+        #
+        table = bytearray(range(256))
+        for instr, text in reversed(instruction_map.items()):
+            table[ord(text)] = instr
+        delete = bytes(set(range(256)) - {ord(text) for text in instruction_map.values()})
+        return lambda data: data.encode("latin-1", "ignore").translate(table, delete)
+
+    @staticmethod
+    def _make_char_translator(
+        instruction_map: dict[Instruction, str],
+    ) -> Optional[Callable[[str], bytes]]:
+        """
+        Returns a tokeniser that removes runs of characters that aren't instructions with a
+        pattern, and maps the rest to opcodes with `str.translate`. Unlike `_make_translator`,
+        instructions may be any character.
+
+        Returns `None` if any instruction is not a single character.
+        """
+        if any(len(text) != 1 for text in instruction_map.values()):
+            return None
+        others = re.compile(f"[^{re.escape("".join(instruction_map.values()))}]+")
+        # If instructions share a character, the first one wins (as it does when scanning).
+        #
+        table = {ord(text): instr for instr, text in reversed(instruction_map.items())}
+        return lambda data: others.sub("", data).translate(table).encode("latin-1")
+
+    @staticmethod
+    def _make_scanner(instruction_map: dict[Instruction, str]) -> Callable[[str], bytes]:
+        """
+        Returns a tokeniser that finds every instruction with a single pattern. The pattern has no
+        groups, so `findall` returns the matched instructions' text, which is mapped to opcodes.
+
+        Alternatives are bucketed by their first character, so only instructions starting with
+        the current character are tried; within a bucket, longer instructions are tried first.
+        """
+        tokens = sorted(instruction_map.values(), key=lambda text: -len(text))
+        buckets = dict[str, list[str]]()
+        for text in tokens:
+            buckets.setdefault(text[0], []).append(re.escape(text[1:]))
+        # fmt: off
+        pattern = re.compile("|".join(
+            f"{re.escape(char)}(?:{"|".join(alternatives)})"
+            for char, alternatives in buckets.items()))
+        # fmt: on
+
+        # If instructions share text, the first one wins (as it does when scanning).
+        #
+        opcodes = {text: instr for instr, text in reversed(instruction_map.items())}
+        return lambda data: bytes(map(opcodes.__getitem__, pattern.findall(data)))
+
     @classmethod
     def from_relex_file(cls, file: TextIOWrapper) -> Self:
         """
@@ -86,7 +148,8 @@ class Relex:
                 # fmt: on
             instr_map[instr] = relex_instr.strip()
 
-        return cls(name=Path(file.name).stem, instruction_map=instr_map)
+        name, _ = os.path.splitext(os.path.basename(file.name))
+        return cls(name=name, instruction_map=instr_map)
 
     @classmethod
     def standard(cls) -> Self:
@@ -105,16 +168,14 @@ class Relex:
             Instruction.EndLoop: "]"})
         # fmt: on
 
-    def text_to_instrs(self, text: TextIOWrapper) -> Iterable[Instruction]:
-        """Scans input text and generates instructions (with corresponding indices)."""
-
-        while _buf_peek(text, 1) != "":
-            for instr_enum, instr_text in self.instruction_map.items():
-                len_instr_text = len(instr_text)
-                value = _buf_peek(text, len_instr_text)
-                if value == instr_text:
-                    yield instr_enum
-                    text.read(len_instr_text)
-                    break
-            else:
-                text.read(1)
+    def text_to_opcodes(self, text: TextIOWrapper) -> bytes:
+        """
+        Scans input text and returns its instructions as opcodes (see `Instruction`).
+
+        Where more than one instruction matches at the same position, the longest one wins.
+
+        Relexes where every instruction is a single character (such as the standard one) are
+        translated in bulk, without scanning character by character; others are matched in bulk
+        with a single pattern (see `_make_scanner`).
+        """
+        return self._tokenise(text.read())